@@ -0,0 +1,99 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""
+Ahead of time compiled copula kernels, used by functions.py when numba is not installed.
+Build in place with: python setup.py build_ext --inplace
+"""
+from cython.parallel import prange
+from libc.math cimport fabs, fmax, fmin, sqrt
+
+cdef double ZERO_TOL = 1e-12
+
+
+cdef inline double _cqq_scalar(double q1, double q2, double r) noexcept nogil:
+    cdef double p1 = 1.0 - q1
+    cdef double p2 = 1.0 - q2
+    cdef double prod = q1 * q2
+    cdef double lower = fmax(0.0, q1 + q2 - 1.0)
+    cdef double upper = fmin(q1, q2)
+    cdef double v
+    # comparisons rather than fmin/fmax so that a NaN correlation propagates
+    if r > 1.0:
+        r = 1.0
+    elif r < -1.0:
+        r = -1.0
+    v = prod + r * sqrt(fmax(0.0, p1 * p2 * prod))
+    if v < lower:
+        v = lower
+    if v > upper:
+        v = upper
+    return v
+
+
+def cqq_scalar(double q1, double q2, double r):
+    """
+    :param q1: probability of event 1 not happening
+    :param q2: probability of event 2 not happening
+    :param r: correlation between events 1 and 2
+    :return: probability of neither event 1 nor event 2 happening
+    """
+    return _cqq_scalar(q1, q2, r)
+
+
+def cqq(const double[::1] q1, const double[::1] q2, const double[::1] r, double[::1] out):
+    """
+    Elementwise cqq over equal length contiguous arrays, written into out
+    """
+    cdef Py_ssize_t i
+    cdef Py_ssize_t n = out.shape[0]
+    if q1.shape[0] != n or q2.shape[0] != n or r.shape[0] != n:
+        raise ValueError("inputs must have the length of out, %d" % n)
+    for i in prange(n, nogil=True):
+        out[i] = _cqq_scalar(q1[i], q2[i], r[i])
+
+
+def trivariate_joint(const double[::1] p1, const double[::1] p2, const double[::1] p3,
+                     const double[::1] r1, const double[::1] r2, const double[::1] r3, const double[::1] r4,
+                     double[:, ::1] out):
+    """
+    Elementwise trivariate joint distribution over equal length contiguous arrays,
+    written into out with shape (8, n) ordered by the binary cell name
+    """
+    cdef Py_ssize_t i
+    cdef double q1, q2, q3, pp2, inv, C12, C23, C130, C131
+    cdef Py_ssize_t n = out.shape[1]
+    if out.shape[0] != 8:
+        raise ValueError("out must have 8 rows, got %d" % out.shape[0])
+    if (p1.shape[0] != n or p2.shape[0] != n or p3.shape[0] != n
+            or r1.shape[0] != n or r2.shape[0] != n or r3.shape[0] != n or r4.shape[0] != n):
+        raise ValueError("inputs must have the length of out, %d" % n)
+    for i in prange(n, nogil=True):
+        q1 = 1.0 - p1[i]
+        q2 = 1.0 - p2[i]
+        q3 = 1.0 - p3[i]
+        pp2 = p2[i]
+        C12 = _cqq_scalar(q1, q2, r1[i])
+        C23 = _cqq_scalar(q2, q3, r2[i])
+        if fabs(q2) < ZERO_TOL:
+            out[0, i] = 0.0
+            out[1, i] = 0.0
+            out[4, i] = 0.0
+            out[5, i] = 0.0
+        else:
+            inv = 1.0 / q2
+            C130 = _cqq_scalar(C12 * inv, C23 * inv, r3[i])
+            out[0, i] = q2 * C130
+            out[1, i] = C12 - q2 * C130
+            out[4, i] = C23 - q2 * C130
+            out[5, i] = q2 - C23 - C12 + q2 * C130
+        if fabs(pp2) < ZERO_TOL:
+            out[2, i] = 0.0
+            out[3, i] = 0.0
+            out[6, i] = 0.0
+            out[7, i] = 0.0
+        else:
+            inv = 1.0 / pp2
+            C131 = _cqq_scalar((q1 - C12) * inv, (q3 - C23) * inv, r4[i])
+            out[2, i] = pp2 * C131
+            out[3, i] = q1 - C12 - pp2 * C131
+            out[6, i] = q3 - C23 - pp2 * C131
+            out[7, i] = 1.0 - q1 - q2 - q3 + C12 + C23 + pp2 * C131
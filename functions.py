@@ -1,5 +1,26 @@
+import math
+import os
+
 import numpy as np
 
+try:
+    import numba as nb
+except ImportError:
+    nb = None
+
+# numba target for the ufunc kernels, 'cpu' avoids the thread launch overhead when arrays are small
+_NUMBA_TARGET = os.environ.get('PPC_NUMBA_TARGET', 'parallel')
+# fastmath without the no-NaN/no-inf assumptions, so missing inputs propagate as NaN
+_FASTMATH = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+if nb is None:
+    try:
+        import _cqq
+    except ImportError:
+        _cqq = None
+else:
+    _cqq = None
+
 """ 
 A set of functions for calculating joint probabilities of dependant binary outcomes given the marginal probabilities.
 These are technically Guassian Copulas (equation 2 of Lin & Chaganty)
@@ -9,7 +30,7 @@ https://arxiv.org/ftp/arxiv/papers/2101/2101.02280.pdf
 """
 
 
-def copula_clip(u1, u2, vec):
+def copula_clip(u1, u2, vec, out=None):
     """
     A function used to ensure that copulas are restricted to outputting values in the correct bounds
     For details see
@@ -18,14 +39,136 @@ def copula_clip(u1, u2, vec):
     :param u1: probability of event 1 not happening
     :param u2: probability of event 2 not happening
     :param vec: copula suggested probability of neither event 1 nor event 2 happening
+    :param out: optional array to write the result into
     :return: correctly bounded probability of neither event 1 nor event 2 happening
     """
-    upper = np.min((u1, u2), axis=0)
-    lower = np.clip(u1 + u2 - 1, 0, None)
-    return np.clip(vec, lower, upper)
+    upper = np.minimum(u1, u2)
+    lower = np.asarray(np.add(u1, u2))
+    lower -= 1
+    np.maximum(lower, 0, out=lower)
+    return np.clip(vec, lower, upper, out=out)
+
+
+def _scalar_kernel(fn):
+    """
+    Compile a scalar helper with numba so it can be inlined into the ufunc kernels.
+    Without numba the helper is returned unchanged as plain Python.
+    """
+    if nb is None:
+        return fn
+    return nb.njit(inline='always', fastmath=_FASTMATH, error_model='numpy')(fn)
+
 
+def _lazy(build, *args):
+    """
+    Defer building a numba ufunc until its first call, so importing the module does not compile every kernel
+    :param build: function returning the ufunc
+    :param args: arguments passed to build
+    :return: callable forwarding to the ufunc
+    """
+    kernel = None
 
-def cqq(q1, q2, r):
+    def call(*call_args, **kwargs):
+        nonlocal kernel
+        if kernel is None:
+            kernel = build(*args)
+        return kernel(*call_args, **kwargs)
+    return call
+
+
+def _contiguous_out(ufunc):
+    """
+    Guard a numba vectorize ufunc against non-contiguous out arrays, which it can fill with the wrong strides
+    when every input shares one stride. Such an out is filled from a contiguous temporary instead.
+    :param ufunc: numba ufunc
+    :return: callable with the ufunc's signature
+    """
+    def call(*args, out=None):
+        if out is None or out.flags.c_contiguous:
+            return ufunc(*args, out=out)
+        np.copyto(out, ufunc(*args))
+        return out
+    return call
+
+
+@_scalar_kernel
+def _cqq_scalar(q1, q2, r):
+    """
+    Scalar version of cqq with the correlation clip and copula_clip fused in
+    :param q1: probability of event 1 not happening
+    :param q2: probability of event 2 not happening
+    :param r: correlation between events 1 and 2
+    :return: probability of neither event 1 nor event 2 happening
+    """
+    if r > 1.0:
+        r = 1.0
+    elif r < -1.0:
+        r = -1.0
+    p1, p2 = 1.0 - q1, 1.0 - q2
+    prod = q1 * q2
+    v = prod + r * math.sqrt(max(0.0, p1 * p2 * prod))
+    lower, upper = max(0.0, q1 + q2 - 1.0), min(q1, q2)
+    if v < lower:
+        v = lower
+    if v > upper:
+        v = upper
+    return v
+
+
+if _cqq is not None:
+    # the compiled kernel also speeds up the plain Python cell kernels, which look _cqq_scalar up at call time
+    _cqq_scalar = _cqq.cqq_scalar
+
+
+def _build_cqq_ufunc():
+    @nb.vectorize([nb.float32(nb.float32, nb.float32, nb.float32), nb.float64(nb.float64, nb.float64, nb.float64)],
+                  target=_NUMBA_TARGET, fastmath=_FASTMATH)
+    def _cqq_ufunc(q1, q2, r):
+        return _cqq_scalar(q1, q2, r)
+    return _contiguous_out(_cqq_ufunc)
+
+
+_cqq_ufunc = None if nb is None else _lazy(_build_cqq_ufunc)
+
+
+def _all_scalars(*args):
+    """
+    :return: True if every argument is a plain int or float, which can skip NumPy entirely
+    """
+    return all(isinstance(a, (int, float)) for a in args)
+
+
+def _floats(*args):
+    """
+    Convert scalar arguments to float so the njit scalar kernels only ever compile a single float64 specialisation
+    :return: list of the arguments as floats
+    """
+    return [float(a) for a in args]
+
+
+def _compiled(kernel, n_out, *args, out=None):
+    """
+    Broadcast the arguments to flat contiguous float64 arrays, run one of the compiled _cqq kernels over them
+    and restore the broadcast shape
+    :param kernel: _cqq kernel writing its results into a trailing out array
+    :param n_out: number of outputs per element, None for a single output
+    :param out: optional array to write the result into, written directly when it is C contiguous float64
+    :return: kernel output with the broadcast shape, preceded by an axis of length n_out if given
+    """
+    args = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in args))
+    flat = [np.ascontiguousarray(a).reshape(-1) for a in args]
+    shape = args[0].shape if n_out is None else (n_out,) + args[0].shape
+    direct = out is not None and out.shape == shape and out.dtype == np.float64 and out.flags.c_contiguous
+    return_vec = out if direct else np.empty(shape)
+    kernel(*flat, return_vec.reshape(-1) if n_out is None else return_vec.reshape(n_out, -1))
+    if out is None:
+        return return_vec[()]
+    if not direct:
+        np.copyto(out, return_vec)
+    return out
+
+
+def cqq(q1, q2, r, out=None):
     """
     Backbone of the copula calculations, for details see:
     https://jsdajournal.springeropen.com/articles/10.1186/s40488-021-00118-z
@@ -33,84 +176,431 @@ def cqq(q1, q2, r):
     :param q1: probability of event 1 not happening
     :param q2: probability of event 2 not happening
     :param r: correlation between events 1 and 2
+    :param out: optional array to write the result into
     :return: probability of neither event 1 nor event 2 happening
     """
-    np.clip(r, -1, 1)
+    if out is None and _all_scalars(q1, q2, r):
+        return _cqq_scalar(*_floats(q1, q2, r))
+    if _cqq_ufunc is not None:
+        return _cqq_ufunc(q1, q2, r, out=out)
+    if _cqq is not None:
+        return _compiled(_cqq.cqq, None, q1, q2, r, out=out)
+    # np.clip returns a strong float64 for a Python float r, which would promote float32 inputs
+    r = np.clip(r, -1.0, 1.0).astype(np.result_type(q1, q2, r), copy=False)
     p1, p2 = 1 - q1, 1 - q2
-    return_vec = 1 - p1 - p2 + p1 * p2 + r * np.sqrt(p1 * p2 * q1 * q2)
-    return_vec = copula_clip(q1, q2, return_vec)
+    prod = q1 * q2
+    return_vec = prod + r * np.sqrt(np.maximum(p1 * p2 * prod, 0))
+    if out is None and isinstance(return_vec, np.ndarray):
+        out = return_vec  # clip the temporary in place rather than allocating another
+    return_vec = copula_clip(q1, q2, return_vec, out=out)
     return return_vec
 
 
-def bivariate_00(p1, p2, r):
+@_scalar_kernel
+def _bivariate_00_scalar(p1, p2, r):
+    """Scalar kernel of bivariate_00"""
+    return _cqq_scalar(1.0 - p1, 1.0 - p2, r)
+
+
+@_scalar_kernel
+def _bivariate_10_scalar(p1, p2, r):
+    """Scalar kernel of bivariate_10"""
+    q1, q2 = 1.0 - p1, 1.0 - p2
+    return q2 - _cqq_scalar(q1, q2, r)
+
+
+@_scalar_kernel
+def _bivariate_01_scalar(p1, p2, r):
+    """Scalar kernel of bivariate_01"""
+    q1, q2 = 1.0 - p1, 1.0 - p2
+    return q1 - _cqq_scalar(q1, q2, r)
+
+
+@_scalar_kernel
+def _bivariate_11_scalar(p1, p2, r):
+    """Scalar kernel of bivariate_11"""
+    q1, q2 = 1.0 - p1, 1.0 - p2
+    return 1.0 - q1 - q2 + _cqq_scalar(q1, q2, r)
+
+
+@_scalar_kernel
+def _bivariate_any_scalar(p1, p2, r):
+    """Scalar kernel of bivariate_any"""
+    return 1.0 - _cqq_scalar(1.0 - p1, 1.0 - p2, r)
+
+
+def _bivariate_ufunc(cell):
+    """
+    Wrap a scalar bivariate cell into a numba ufunc
+    :param cell: scalar kernel taking p1, p2, r
+    :return: ufunc broadcasting the cell over array inputs
+    """
+    def kernel(p1, p2, r):
+        return cell(p1, p2, r)
+    ufunc = nb.vectorize([t(t, t, t) for t in (nb.float32, nb.float64)], target=_NUMBA_TARGET, fastmath=_FASTMATH)(kernel)
+    return _contiguous_out(ufunc)
+
+
+def _build_bivariate_joint_gufunc():
+    @nb.guvectorize([(t,) * 3 + (t[:],) * 4 for t in (nb.float32, nb.float64)],
+                    '(),(),()->(),(),(),()', target=_NUMBA_TARGET, fastmath=_FASTMATH)
+    def _bivariate_joint_gufunc(p1, p2, r, c00, c01, c10, c11):
+        q1, q2 = 1.0 - p1, 1.0 - p2
+        C12 = _cqq_scalar(q1, q2, r)
+        c00[0] = C12
+        c01[0] = q1 - C12
+        c10[0] = q2 - C12
+        c11[0] = 1.0 - q1 - q2 + C12
+    return _bivariate_joint_gufunc
+
+
+if nb is not None:
+    _bivariate_00_ufunc = _lazy(_bivariate_ufunc, _bivariate_00_scalar)
+    _bivariate_10_ufunc = _lazy(_bivariate_ufunc, _bivariate_10_scalar)
+    _bivariate_01_ufunc = _lazy(_bivariate_ufunc, _bivariate_01_scalar)
+    _bivariate_11_ufunc = _lazy(_bivariate_ufunc, _bivariate_11_scalar)
+    _bivariate_any_ufunc = _lazy(_bivariate_ufunc, _bivariate_any_scalar)
+    _bivariate_joint_gufunc = _lazy(_build_bivariate_joint_gufunc)
+
+
+def bivariate_00(p1, p2, r, out=None):
     """
     :param p1: Marginal probability of event 1
     :param p2: Marginal probability of event 2
     :param r: Correlation of event 1 and 2
+    :param out: optional array to write the result into
     :return: Joint probability of neither event occurring
     """
+    if out is None and _all_scalars(p1, p2, r):
+        return _bivariate_00_scalar(*_floats(p1, p2, r))
+    if nb is not None:
+        return _bivariate_00_ufunc(p1, p2, r, out=out)
     q1, q2 = 1 - p1, 1 - p2
-    return_vec = cqq(q1, q2, r)
+    return_vec = cqq(q1, q2, r, out=out)
     return return_vec
 
 
-def bivariate_10(p1, p2, r):
+def bivariate_10(p1, p2, r, out=None):
     """
      :param p1: Marginal probability of event 1
     :param p2: Marginal probability of event 2
     :param r: Correlation of event 1 and 2
+    :param out: optional array to write the result into
     :return: Joint probability of event 1 and not event 2 occurring
     """
+    if out is None and _all_scalars(p1, p2, r):
+        return _bivariate_10_scalar(*_floats(p1, p2, r))
+    if nb is not None:
+        return _bivariate_10_ufunc(p1, p2, r, out=out)
     q1, q2 = 1 - p1, 1 - p2
-    return_vec = q2 - cqq(q1, q2, r)
+    return_vec = np.subtract(q2, cqq(q1, q2, r, out=out), out=out)
     return return_vec
 
 
-def bivariate_01(p1, p2, r):
+def bivariate_01(p1, p2, r, out=None):
     """
     :param p1: Marginal probability of event 1
     :param p2: Marginal probability of event 2
     :param r: Correlation of event 1 and 2
+    :param out: optional array to write the result into
     :return: Joint probability of event 2 and not event 1 occurring
     """
+    if out is None and _all_scalars(p1, p2, r):
+        return _bivariate_01_scalar(*_floats(p1, p2, r))
+    if nb is not None:
+        return _bivariate_01_ufunc(p1, p2, r, out=out)
     q1, q2 = 1 - p1, 1 - p2
-    return_vec = q1 - cqq(q1, q2, r)
+    return_vec = np.subtract(q1, cqq(q1, q2, r, out=out), out=out)
     return return_vec
 
 
-def bivariate_11(p1, p2, r):
+def bivariate_11(p1, p2, r, out=None):
     """
     :param p1: Marginal probability of event 1
     :param p2: Marginal probability of event 2
     :param r: Correlation of event 1 and 2
+    :param out: optional array to write the result into
     :return: Joint probability both events occurring
     """
+    if out is None and _all_scalars(p1, p2, r):
+        return _bivariate_11_scalar(*_floats(p1, p2, r))
+    if nb is not None:
+        return _bivariate_11_ufunc(p1, p2, r, out=out)
     q1, q2 = 1 - p1, 1 - p2
-    return_vec = 1 - q1 - q2 + cqq(q1, q2, r)
+    return_vec = np.add(1 - q1 - q2, cqq(q1, q2, r, out=out), out=out)
     return return_vec
 
 
-def bivariate_any(p1, p2, r):
+def bivariate_any(p1, p2, r, out=None):
     """
     :param p1: Marginal probability of event 1
     :param p2: Marginal probability of event 2
     :param r: Correlation of event 1 and 2
+    :param out: optional array to write the result into
     :return: Probability of either event occuring
     """
-    return 1 - bivariate_00(p1, p2, r)
+    if out is None and _all_scalars(p1, p2, r):
+        return _bivariate_any_scalar(*_floats(p1, p2, r))
+    if nb is not None:
+        return _bivariate_any_ufunc(p1, p2, r, out=out)
+    return np.subtract(1, bivariate_00(p1, p2, r, out=out), out=out)
 
 
-def bivariate_all(p1, p2, r):
+def bivariate_all(p1, p2, r, out=None):
     """
     :param p1: Marginal probability of event 1
     :param p2: Marginal probability of event 2
     :param r: Correlation of event 1 and 2
+    :param out: optional array to write the result into
     :return: Joint probability both events occurring
     """
-    return bivariate_11(p1, p2, r)
+    return bivariate_11(p1, p2, r, out=out)
 
 
-def trivariate000(p1, p2, p3, r1, r2, r3, r4):
+def _check_out(out, shape):
+    """
+    :param out: optional array the result will be written into
+    :param shape: shape of the result
+    :raises ValueError: if out is given with a different shape, which the numba gufuncs would not catch
+    """
+    if out is not None and out.shape != shape:
+        raise ValueError("out must have shape %s, got %s" % (shape, out.shape))
+
+
+def bivariate_joint(p1, p2, r, out=None):
+    """
+    Full joint distribution of the two events from a single cqq evaluation.
+    Prefer this over calling bivariate_00 ... bivariate_11 separately when several cells are needed.
+    :param p1: Marginal probability of event 1
+    :param p2: Marginal probability of event 2
+    :param r: Correlation of event 1 and 2
+    :param out: optional array of shape (4,) + the broadcast shape of the inputs to write the result into
+    :return: array whose leading axis of length 4 holds the cells 00, 01, 10 and 11,
+    indexed by the binary cell name, e.g. bivariate_joint(...)[0b10] equals bivariate_10(...)
+    :raises ValueError: if out has the wrong shape
+    """
+    shape = (4,) + np.broadcast_shapes(np.shape(p1), np.shape(p2), np.shape(r))
+    _check_out(out, shape)
+    if nb is not None:
+        if out is None:
+            out = np.empty(shape, dtype=np.result_type(p1, p2, r, 1.0))
+        _bivariate_joint_gufunc(p1, p2, r, out=tuple(out[i, ...] for i in range(4)))
+        return out
+    q1, q2 = 1 - p1, 1 - p2
+    C12 = cqq(q1, q2, r)
+    return np.stack(np.broadcast_arrays(C12, q1 - C12, q2 - C12, 1 - q1 - q2 + C12), out=out)
+
+
+_ZERO_TOL = 1e-12
+
+
+def _reciprocal(x):
+    """
+    1 / x without raising for a zero divisor, which gives inf for _zero_where_close to mask
+    :param x: divisor, scalar or array
+    :return: reciprocal of x, a plain float when x is a scalar so that it does not promote float32 arrays
+    """
+    inv = np.divide(1.0, x)
+    return float(inv) if isinstance(x, (int, float)) else inv
+
+def _zero_where_close(x, vec):
+    """
+    Set vec to zero wherever x is numerically zero, in place when vec is an array
+    :param x: divisor used to compute vec
+    :param vec: probabilities to guard
+    :return: vec with entries zeroed where x is close to zero
+    """
+    mask = np.abs(x) < _ZERO_TOL
+    if not np.any(mask):
+        return vec
+    if isinstance(vec, np.ndarray):
+        np.copyto(vec, 0.0, where=mask)
+        return vec
+    return np.where(mask, 0.0, vec)
+
+
+@_scalar_kernel
+def _trivariate_q2_terms(q1, q2, q3, r1, r2, r3):
+    """
+    Scalar copula terms shared by the trivariate cells conditional on event 2 not occurring
+    :return: C12, C23 and the copula of events 1 and 3 given event 2 did not occur
+    """
+    C12 = _cqq_scalar(q1, q2, r1)
+    C23 = _cqq_scalar(q2, q3, r2)
+    inv_q2 = 1.0 / q2
+    C130 = _cqq_scalar(C12 * inv_q2, C23 * inv_q2, r3)
+    return C12, C23, C130
+
+
+@_scalar_kernel
+def _trivariate_p2_terms(q1, q2, q3, r1, r2, r4):
+    """
+    Scalar copula terms shared by the trivariate cells conditional on event 2 occurring
+    :return: C12, C23 and the copula of events 1 and 3 given event 2 did occur
+    """
+    p2 = 1.0 - q2
+    C12 = _cqq_scalar(q1, q2, r1)
+    C23 = _cqq_scalar(q2, q3, r2)
+    inv_p2 = 1.0 / p2
+    C131 = _cqq_scalar((q1 - C12) * inv_p2, (q3 - C23) * inv_p2, r4)
+    return C12, C23, C131
+
+
+@_scalar_kernel
+def _trivariate000_scalar(p1, p2, p3, r1, r2, r3, r4):
+    """Scalar kernel of trivariate000"""
+    q1, q2, q3 = 1.0 - p1, 1.0 - p2, 1.0 - p3
+    if abs(q2) < _ZERO_TOL:
+        return 0.0
+    C12, C23, C130 = _trivariate_q2_terms(q1, q2, q3, r1, r2, r3)
+    return q2 * C130
+
+
+@_scalar_kernel
+def _trivariate001_scalar(p1, p2, p3, r1, r2, r3, r4):
+    """Scalar kernel of trivariate001"""
+    q1, q2, q3 = 1.0 - p1, 1.0 - p2, 1.0 - p3
+    if abs(q2) < _ZERO_TOL:
+        return 0.0
+    C12, C23, C130 = _trivariate_q2_terms(q1, q2, q3, r1, r2, r3)
+    return C12 - q2 * C130
+
+
+@_scalar_kernel
+def _trivariate010_scalar(p1, p2, p3, r1, r2, r3, r4):
+    """Scalar kernel of trivariate010"""
+    q1, q2, q3 = 1.0 - p1, 1.0 - p2, 1.0 - p3
+    if abs(p2) < _ZERO_TOL:
+        return 0.0
+    C12, C23, C131 = _trivariate_p2_terms(q1, q2, q3, r1, r2, r4)
+    return p2 * C131
+
+
+@_scalar_kernel
+def _trivariate011_scalar(p1, p2, p3, r1, r2, r3, r4):
+    """Scalar kernel of trivariate011"""
+    q1, q2, q3 = 1.0 - p1, 1.0 - p2, 1.0 - p3
+    if abs(p2) < _ZERO_TOL:
+        return 0.0
+    C12, C23, C131 = _trivariate_p2_terms(q1, q2, q3, r1, r2, r4)
+    return q1 - C12 - p2 * C131
+
+
+@_scalar_kernel
+def _trivariate100_scalar(p1, p2, p3, r1, r2, r3, r4):
+    """Scalar kernel of trivariate100"""
+    q1, q2, q3 = 1.0 - p1, 1.0 - p2, 1.0 - p3
+    if abs(q2) < _ZERO_TOL:
+        return 0.0
+    C12, C23, C130 = _trivariate_q2_terms(q1, q2, q3, r1, r2, r3)
+    return C23 - q2 * C130
+
+
+@_scalar_kernel
+def _trivariate101_scalar(p1, p2, p3, r1, r2, r3, r4):
+    """Scalar kernel of trivariate101"""
+    q1, q2, q3 = 1.0 - p1, 1.0 - p2, 1.0 - p3
+    if abs(q2) < _ZERO_TOL:
+        return 0.0
+    C12, C23, C130 = _trivariate_q2_terms(q1, q2, q3, r1, r2, r3)
+    return q2 - C23 - C12 + q2 * C130
+
+
+@_scalar_kernel
+def _trivariate110_scalar(p1, p2, p3, r1, r2, r3, r4):
+    """Scalar kernel of trivariate110"""
+    q1, q2, q3 = 1.0 - p1, 1.0 - p2, 1.0 - p3
+    if abs(p2) < _ZERO_TOL:
+        return 0.0
+    C12, C23, C131 = _trivariate_p2_terms(q1, q2, q3, r1, r2, r4)
+    return q3 - C23 - p2 * C131
+
+
+@_scalar_kernel
+def _trivariate111_scalar(p1, p2, p3, r1, r2, r3, r4):
+    """Scalar kernel of trivariate111"""
+    q1, q2, q3 = 1.0 - p1, 1.0 - p2, 1.0 - p3
+    if abs(p2) < _ZERO_TOL:
+        return 0.0
+    C12, C23, C131 = _trivariate_p2_terms(q1, q2, q3, r1, r2, r4)
+    return 1.0 - q1 - q2 - q3 + C12 + C23 + p2 * C131
+
+
+@_scalar_kernel
+def _trivariate_any_scalar(p1, p2, p3, r1, r2, r3, r4):
+    """Scalar kernel of trivariate_any"""
+    q1, q2, q3 = 1.0 - p1, 1.0 - p2, 1.0 - p3
+    if abs(q2) < _ZERO_TOL:
+        return 1.0
+    C12, C23, C130 = _trivariate_q2_terms(q1, q2, q3, r1, r2, r3)
+    return 1.0 - q2 * C130
+
+
+def _trivariate_gufunc(cell):
+    """
+    Wrap a scalar trivariate cell into a parallel numba gufunc over the element dimension
+    :param cell: scalar kernel taking p1, p2, p3, r1, r2, r3, r4
+    :return: gufunc broadcasting the cell over array inputs
+    """
+    def kernel(p1, p2, p3, r1, r2, r3, r4, out):
+        out[0] = cell(p1, p2, p3, r1, r2, r3, r4)
+    return nb.guvectorize([(t,) * 7 + (t[:],) for t in (nb.float32, nb.float64)], '(),(),(),(),(),(),()->()',
+                          target=_NUMBA_TARGET, fastmath=_FASTMATH)(kernel)
+
+
+@_scalar_kernel
+def _trivariate_joint_scalar(p1, p2, p3, r1, r2, r3, r4):
+    """
+    Scalar kernel of trivariate_joint, also compiled for the device by functions_cuda
+    :return: tuple of the cells 000, 001, 010, 011, 100, 101, 110 and 111
+    """
+    q1, q2, q3 = 1.0 - p1, 1.0 - p2, 1.0 - p3
+    C12 = _cqq_scalar(q1, q2, r1)
+    C23 = _cqq_scalar(q2, q3, r2)
+    if abs(q2) < _ZERO_TOL:
+        c000 = c001 = c100 = c101 = 0.0
+    else:
+        inv_q2 = 1.0 / q2
+        C130 = _cqq_scalar(C12 * inv_q2, C23 * inv_q2, r3)
+        c000 = q2 * C130
+        c001 = C12 - q2 * C130
+        c100 = C23 - q2 * C130
+        c101 = q2 - C23 - C12 + q2 * C130
+    if abs(p2) < _ZERO_TOL:
+        c010 = c011 = c110 = c111 = 0.0
+    else:
+        inv_p2 = 1.0 / p2
+        C131 = _cqq_scalar((q1 - C12) * inv_p2, (q3 - C23) * inv_p2, r4)
+        c010 = p2 * C131
+        c011 = q1 - C12 - p2 * C131
+        c110 = q3 - C23 - p2 * C131
+        c111 = 1.0 - q1 - q2 - q3 + C12 + C23 + p2 * C131
+    return c000, c001, c010, c011, c100, c101, c110, c111
+
+
+def _build_trivariate_joint_gufunc():
+    @nb.guvectorize([(t,) * 7 + (t[:],) * 8 for t in (nb.float32, nb.float64)],
+                    '(),(),(),(),(),(),()->(),(),(),(),(),(),(),()', target=_NUMBA_TARGET, fastmath=_FASTMATH)
+    def _trivariate_joint_gufunc(p1, p2, p3, r1, r2, r3, r4, c000, c001, c010, c011, c100, c101, c110, c111):
+        (c000[0], c001[0], c010[0], c011[0],
+         c100[0], c101[0], c110[0], c111[0]) = _trivariate_joint_scalar(p1, p2, p3, r1, r2, r3, r4)
+    return _trivariate_joint_gufunc
+
+
+if nb is not None:
+    _trivariate000_gufunc = _lazy(_trivariate_gufunc, _trivariate000_scalar)
+    _trivariate001_gufunc = _lazy(_trivariate_gufunc, _trivariate001_scalar)
+    _trivariate010_gufunc = _lazy(_trivariate_gufunc, _trivariate010_scalar)
+    _trivariate011_gufunc = _lazy(_trivariate_gufunc, _trivariate011_scalar)
+    _trivariate100_gufunc = _lazy(_trivariate_gufunc, _trivariate100_scalar)
+    _trivariate101_gufunc = _lazy(_trivariate_gufunc, _trivariate101_scalar)
+    _trivariate110_gufunc = _lazy(_trivariate_gufunc, _trivariate110_scalar)
+    _trivariate111_gufunc = _lazy(_trivariate_gufunc, _trivariate111_scalar)
+    _trivariate_any_gufunc = _lazy(_trivariate_gufunc, _trivariate_any_scalar)
+    _trivariate_joint_gufunc = _lazy(_build_trivariate_joint_gufunc)
+
+
+def trivariate000(p1, p2, p3, r1, r2, r3, r4, out=None):
     """
     :param p1: Marginal probability of event 1
     :param p2: Marginal probability of event 2
@@ -119,23 +609,29 @@ def trivariate000(p1, p2, p3, r1, r2, r3, r4):
     :param r2: Correlation of event 2 and 3
     :param r3: Correlation of event 1 and 3 conditional on event 2 not occurring
     :param r4: Correlation of event 1 and 3 conditional on event 2 occurring
+    :param out: optional array to write the result into
     :return: Joint probability none of the three events occurring
     """
+    if out is None and _all_scalars(p1, p2, p3, r1, r2, r3, r4):
+        return _trivariate000_scalar(*_floats(p1, p2, p3, r1, r2, r3, r4))
+    if nb is not None:
+        return _trivariate000_gufunc(p1, p2, p3, r1, r2, r3, r4, out=out)
     q1, q2, q3 = 1 - p1, 1 - p2, 1 - p3
 
     C12 = cqq(q1, q2, r1)
     C23 = cqq(q2, q3, r2)
 
-    q10 = C12 / q2
-    q30 = C23 / q2
+    inv_q2 = _reciprocal(q2)
+    q10 = C12 * inv_q2
+    q30 = C23 * inv_q2
     C130 = cqq(q10, q30, r3)
 
-    return_vec = q2 * C130
-    return_vec = np.where(np.isclose(q2, 0.0), 0.0, return_vec)
+    return_vec = np.multiply(q2, C130, out=out)
+    return_vec = _zero_where_close(q2, return_vec)
     return return_vec
 
 
-def trivariate001(p1, p2, p3, r1, r2, r3, r4):
+def trivariate001(p1, p2, p3, r1, r2, r3, r4, out=None):
     """
         :param p1: Marginal probability of event 1
         :param p2: Marginal probability of event 2
@@ -144,23 +640,29 @@ def trivariate001(p1, p2, p3, r1, r2, r3, r4):
         :param r2: Correlation of event 2 and 3
         :param r3: Correlation of event 1 and 3 conditional on event 2 not occurring
         :param r4: Correlation of event 1 and 3 conditional on event 2 occurring
+        :param out: optional array to write the result into
         :return: Joint probability of only event 3 occurring
         """
+    if out is None and _all_scalars(p1, p2, p3, r1, r2, r3, r4):
+        return _trivariate001_scalar(*_floats(p1, p2, p3, r1, r2, r3, r4))
+    if nb is not None:
+        return _trivariate001_gufunc(p1, p2, p3, r1, r2, r3, r4, out=out)
     q1, q2, q3 = 1 - p1, 1 - p2, 1 - p3
 
     C12 = cqq(q1, q2, r1)
     C23 = cqq(q2, q3, r2)
 
-    q10 = C12 / q2
-    q30 = C23 / q2
+    inv_q2 = _reciprocal(q2)
+    q10 = C12 * inv_q2
+    q30 = C23 * inv_q2
     C130 = cqq(q10, q30, r3)
 
-    return_vec = C12 - q2 * C130
-    return_vec = np.where(np.isclose(q2, 0.0), 0.0, return_vec)
+    return_vec = np.subtract(C12, q2 * C130, out=out)
+    return_vec = _zero_where_close(q2, return_vec)
     return return_vec
 
 
-def trivariate010(p1, p2, p3, r1, r2, r3, r4):
+def trivariate010(p1, p2, p3, r1, r2, r3, r4, out=None):
     """
     :param p1: Marginal probability of event 1
     :param p2: Marginal probability of event 2
@@ -169,24 +671,30 @@ def trivariate010(p1, p2, p3, r1, r2, r3, r4):
     :param r2: Correlation of event 2 and 3
     :param r3: Correlation of event 1 and 3 conditional on event 2 not occurring
     :param r4: Correlation of event 1 and 3 conditional on event 2 occurring
+    :param out: optional array to write the result into
     :return: Joint probability of only event 2 occurring
     """
+    if out is None and _all_scalars(p1, p2, p3, r1, r2, r3, r4):
+        return _trivariate010_scalar(*_floats(p1, p2, p3, r1, r2, r3, r4))
+    if nb is not None:
+        return _trivariate010_gufunc(p1, p2, p3, r1, r2, r3, r4, out=out)
     q1, q2, q3 = 1 - p1, 1 - p2, 1 - p3
 
     C12 = cqq(q1, q2, r1)
     C23 = cqq(q2, q3, r2)
 
-    q11 = (q1 - C12) / p2
-    q31 = (q3 - C23) / p2
+    inv_p2 = _reciprocal(p2)
+    q11 = (q1 - C12) * inv_p2
+    q31 = (q3 - C23) * inv_p2
 
     C131 = cqq(q11, q31, r4)
 
-    return_vec = p2 * C131
-    return_vec = np.where(np.isclose(p2, 0.0), 0.0, return_vec)
+    return_vec = np.multiply(p2, C131, out=out)
+    return_vec = _zero_where_close(p2, return_vec)
     return return_vec
 
 
-def trivariate011(p1, p2, p3, r1, r2, r3, r4):
+def trivariate011(p1, p2, p3, r1, r2, r3, r4, out=None):
     """
     :param p1: Marginal probability of event 1
     :param p2: Marginal probability of event 2
@@ -195,23 +703,29 @@ def trivariate011(p1, p2, p3, r1, r2, r3, r4):
     :param r2: Correlation of event 2 and 3
     :param r3: Correlation of event 1 and 3 conditional on event 2 not occurring
     :param r4: Correlation of event 1 and 3 conditional on event 2 occurring
+    :param out: optional array to write the result into
     :return: Joint probability of only events 2 and 3 occurring
         """
+    if out is None and _all_scalars(p1, p2, p3, r1, r2, r3, r4):
+        return _trivariate011_scalar(*_floats(p1, p2, p3, r1, r2, r3, r4))
+    if nb is not None:
+        return _trivariate011_gufunc(p1, p2, p3, r1, r2, r3, r4, out=out)
     q1, q2, q3 = 1 - p1, 1 - p2, 1 - p3
 
     C12 = cqq(q1, q2, r1)
     C23 = cqq(q2, q3, r2)
 
-    q11 = (q1 - C12) / p2
-    q31 = (q3 - C23) / p2
+    inv_p2 = _reciprocal(p2)
+    q11 = (q1 - C12) * inv_p2
+    q31 = (q3 - C23) * inv_p2
     C131 = cqq(q11, q31, r4)
 
-    return_vec = q1 - C12 - p2 * C131
-    return_vec = np.where(np.isclose(p2, 0.0), 0.0, return_vec)
+    return_vec = np.subtract(q1 - C12, p2 * C131, out=out)
+    return_vec = _zero_where_close(p2, return_vec)
     return return_vec
 
 
-def trivariate100(p1, p2, p3, r1, r2, r3, r4):
+def trivariate100(p1, p2, p3, r1, r2, r3, r4, out=None):
     """
     :param p1: Marginal probability of event 1
     :param p2: Marginal probability of event 2
@@ -220,23 +734,29 @@ def trivariate100(p1, p2, p3, r1, r2, r3, r4):
     :param r2: Correlation of event 2 and 3
     :param r3: Correlation of event 1 and 3 conditional on event 2 not occurring
     :param r4: Correlation of event 1 and 3 conditional on event 2 occurring
+    :param out: optional array to write the result into
     :return: Joint probability of only event 1 occurring
             """
+    if out is None and _all_scalars(p1, p2, p3, r1, r2, r3, r4):
+        return _trivariate100_scalar(*_floats(p1, p2, p3, r1, r2, r3, r4))
+    if nb is not None:
+        return _trivariate100_gufunc(p1, p2, p3, r1, r2, r3, r4, out=out)
     q1, q2, q3 = 1 - p1, 1 - p2, 1 - p3
 
     C12 = cqq(q1, q2, r1)
     C23 = cqq(q2, q3, r2)
 
-    q10 = C12 / q2
-    q30 = C23 / q2
+    inv_q2 = _reciprocal(q2)
+    q10 = C12 * inv_q2
+    q30 = C23 * inv_q2
     C130 = cqq(q10, q30, r3)
 
-    return_vec = C23 - q2 * C130
-    return_vec = np.where(np.isclose(q2, 0.0), 0.0, return_vec)
+    return_vec = np.subtract(C23, q2 * C130, out=out)
+    return_vec = _zero_where_close(q2, return_vec)
     return return_vec
 
 
-def trivariate101(p1, p2, p3, r1, r2, r3, r4):
+def trivariate101(p1, p2, p3, r1, r2, r3, r4, out=None):
     """
     :param p1: Marginal probability of event 1
     :param p2: Marginal probability of event 2
@@ -245,23 +765,29 @@ def trivariate101(p1, p2, p3, r1, r2, r3, r4):
     :param r2: Correlation of event 2 and 3
     :param r3: Correlation of event 1 and 3 conditional on event 2 not occurring
     :param r4: Correlation of event 1 and 3 conditional on event 2 occurring
+    :param out: optional array to write the result into
     :return: Joint probability of only events 1 and 3 occurring
     """
+    if out is None and _all_scalars(p1, p2, p3, r1, r2, r3, r4):
+        return _trivariate101_scalar(*_floats(p1, p2, p3, r1, r2, r3, r4))
+    if nb is not None:
+        return _trivariate101_gufunc(p1, p2, p3, r1, r2, r3, r4, out=out)
     q1, q2, q3 = 1 - p1, 1 - p2, 1 - p3
 
     C12 = cqq(q1, q2, r1)
     C23 = cqq(q2, q3, r2)
 
-    q10 = C12 / q2
-    q30 = C23 / q2
+    inv_q2 = _reciprocal(q2)
+    q10 = C12 * inv_q2
+    q30 = C23 * inv_q2
     C130 = cqq(q10, q30, r3)
 
-    return_vec = q2 - C23 - C12 + q2 * C130
-    return_vec = np.where(np.isclose(q2, 0.0), 0.0, return_vec)
+    return_vec = np.add(q2 - C23 - C12, q2 * C130, out=out)
+    return_vec = _zero_where_close(q2, return_vec)
     return return_vec
 
 
-def trivariate110(p1, p2, p3, r1, r2, r3, r4):
+def trivariate110(p1, p2, p3, r1, r2, r3, r4, out=None):
     """
     :param p1: Marginal probability of event 1
     :param p2: Marginal probability of event 2
@@ -270,23 +796,29 @@ def trivariate110(p1, p2, p3, r1, r2, r3, r4):
     :param r2: Correlation of event 2 and 3
     :param r3: Correlation of event 1 and 3 conditional on event 2 not occurring
     :param r4: Correlation of event 1 and 3 conditional on event 2 occurring
+    :param out: optional array to write the result into
     :return: Joint probability of only events 1 and 2 occurring
             """
+    if out is None and _all_scalars(p1, p2, p3, r1, r2, r3, r4):
+        return _trivariate110_scalar(*_floats(p1, p2, p3, r1, r2, r3, r4))
+    if nb is not None:
+        return _trivariate110_gufunc(p1, p2, p3, r1, r2, r3, r4, out=out)
     q1, q2, q3 = 1 - p1, 1 - p2, 1 - p3
 
     C12 = cqq(q1, q2, r1)
     C23 = cqq(q2, q3, r2)
 
-    q11 = (q1 - C12) / p2
-    q31 = (q3 - C23) / p2
+    inv_p2 = _reciprocal(p2)
+    q11 = (q1 - C12) * inv_p2
+    q31 = (q3 - C23) * inv_p2
     C131 = cqq(q11, q31, r4)
 
-    return_vec = q3 - C23 - p2 * C131
-    return_vec = np.where(np.isclose(q2, 0.0), 0.0, return_vec)
+    return_vec = np.subtract(q3 - C23, p2 * C131, out=out)
+    return_vec = _zero_where_close(p2, return_vec)
     return return_vec
 
 
-def trivariate111(p1, p2, p3, r1, r2, r3, r4):
+def trivariate111(p1, p2, p3, r1, r2, r3, r4, out=None):
     """
     :param p1: Marginal probability of event 1
     :param p2: Marginal probability of event 2
@@ -295,23 +827,29 @@ def trivariate111(p1, p2, p3, r1, r2, r3, r4):
     :param r2: Correlation of event 2 and 3
     :param r3: Correlation of event 1 and 3 conditional on event 2 not occurring
     :param r4: Correlation of event 1 and 3 conditional on event 2 occurring
+    :param out: optional array to write the result into
     :return: Joint probability of all events occurring
             """
+    if out is None and _all_scalars(p1, p2, p3, r1, r2, r3, r4):
+        return _trivariate111_scalar(*_floats(p1, p2, p3, r1, r2, r3, r4))
+    if nb is not None:
+        return _trivariate111_gufunc(p1, p2, p3, r1, r2, r3, r4, out=out)
     q1, q2, q3 = 1 - p1, 1 - p2, 1 - p3
 
     C12 = cqq(q1, q2, r1)
     C23 = cqq(q2, q3, r2)
 
-    q11 = (q1 - C12) / p2
-    q31 = (q3 - C23) / p2
+    inv_p2 = _reciprocal(p2)
+    q11 = (q1 - C12) * inv_p2
+    q31 = (q3 - C23) * inv_p2
     C131 = cqq(q11, q31, r4)
 
-    return_vec = 1 - q1 - q2 - q3 + C12 + C23 + p2 * C131
-    return_vec = np.where(np.isclose(q2, 0.0), 0.0, return_vec)
+    return_vec = np.add(1 - q1 - q2 - q3 + C12 + C23, p2 * C131, out=out)
+    return_vec = _zero_where_close(p2, return_vec)
     return return_vec
 
 
-def trivariate_any(p1, p2, p3, r1, r2, r3, r4):
+def trivariate_any(p1, p2, p3, r1, r2, r3, r4, out=None):
     """
     :param p1: Marginal probability of event 1
     :param p2: Marginal probability of event 2
@@ -320,17 +858,75 @@ def trivariate_any(p1, p2, p3, r1, r2, r3, r4):
     :param r2: Correlation of event 2 and 3
     :param r3: Correlation of event 1 and 3 conditional on event 2 not occurring
     :param r4: Correlation of event 1 and 3 conditional on event 2 occurring
+    :param out: optional array to write the result into
     :return: Joint probability of at least one event occurring
             """
+    if out is None and _all_scalars(p1, p2, p3, r1, r2, r3, r4):
+        return _trivariate_any_scalar(*_floats(p1, p2, p3, r1, r2, r3, r4))
+    if nb is not None:
+        return _trivariate_any_gufunc(p1, p2, p3, r1, r2, r3, r4, out=out)
     q1, q2, q3 = 1 - p1, 1 - p2, 1 - p3
 
     C12 = cqq(q1, q2, r1)
     C23 = cqq(q2, q3, r2)
 
-    q10 = C12 / q2
-    q30 = C23 / q2
+    inv_q2 = _reciprocal(q2)
+    q10 = C12 * inv_q2
+    q30 = C23 * inv_q2
     C130 = cqq(q10, q30, r3)
 
-    return_vec = 1 - q2 * C130
-    return_vec = np.where(np.isclose(q2, 0.0), 0.0, return_vec)
+    return_vec = np.subtract(1, _zero_where_close(q2, q2 * C130), out=out)
     return return_vec
+
+
+def trivariate_joint(p1, p2, p3, r1, r2, r3, r4, out=None):
+    """
+    Full joint distribution of the three events, computing the shared copula terms only once.
+    Prefer this over calling trivariate000 ... trivariate111 separately when several cells are needed.
+    :param p1: Marginal probability of event 1
+    :param p2: Marginal probability of event 2
+    :param p3: Marginal probability of event 3
+    :param r1: Correlation of event 1 and 2
+    :param r2: Correlation of event 2 and 3
+    :param r3: Correlation of event 1 and 3 conditional on event 2 not occurring
+    :param r4: Correlation of event 1 and 3 conditional on event 2 occurring
+    :param out: optional array of shape (8,) + the broadcast shape of the inputs to write the result into
+    :return: array whose leading axis of length 8 holds the cells 000, 001, 010, 011, 100, 101, 110 and 111,
+    indexed by the binary cell name, e.g. trivariate_joint(...)[0b011] equals trivariate011(...)
+    :raises ValueError: if out has the wrong shape
+    """
+    shape = (8,) + np.broadcast_shapes(*map(np.shape, (p1, p2, p3, r1, r2, r3, r4)))
+    _check_out(out, shape)
+    if nb is not None:
+        if out is None:
+            out = np.empty(shape, dtype=np.result_type(p1, p2, p3, r1, r2, r3, r4, 1.0))
+        _trivariate_joint_gufunc(p1, p2, p3, r1, r2, r3, r4, out=tuple(out[i, ...] for i in range(8)))
+        return out
+    if _cqq is not None:
+        return _compiled(_cqq.trivariate_joint, 8, p1, p2, p3, r1, r2, r3, r4, out=out)
+    q1, q2, q3 = 1 - p1, 1 - p2, 1 - p3
+
+    C12 = cqq(q1, q2, r1)
+    C23 = cqq(q2, q3, r2)
+
+    inv_q2 = _reciprocal(q2)
+    q10 = C12 * inv_q2
+    q30 = C23 * inv_q2
+    C130 = cqq(q10, q30, r3)
+
+    inv_p2 = _reciprocal(p2)
+    q11 = (q1 - C12) * inv_p2
+    q31 = (q3 - C23) * inv_p2
+    C131 = cqq(q11, q31, r4)
+
+    cells = [
+        _zero_where_close(q2, q2 * C130),
+        _zero_where_close(q2, C12 - q2 * C130),
+        _zero_where_close(p2, p2 * C131),
+        _zero_where_close(p2, q1 - C12 - p2 * C131),
+        _zero_where_close(q2, C23 - q2 * C130),
+        _zero_where_close(q2, q2 - C23 - C12 + q2 * C130),
+        _zero_where_close(p2, q3 - C23 - p2 * C131),
+        _zero_where_close(p2, 1 - q1 - q2 - q3 + C12 + C23 + p2 * C131),
+    ]
+    return np.stack(np.broadcast_arrays(*cells), out=out)
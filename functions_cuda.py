@@ -0,0 +1,125 @@
+import math
+
+import numpy as np
+from numba import cuda
+
+import functions
+
+"""
+CUDA versions of the copula calculations in functions.py for portfolio scale evaluations.
+These only pay off above roughly a million elements, below about 100k the host to device transfer dominates.
+Inputs can be host arrays or device arrays from cuda.to_device, so that the same inputs can be reused across
+several evaluations without copying them again. Results are returned as device arrays, call .copy_to_host() to
+fetch them.
+Importing this module raises ImportError when no CUDA device is available.
+"""
+
+if not cuda.is_available():
+    raise ImportError("functions_cuda requires a CUDA capable device")
+
+THREADS_PER_BLOCK = 256
+
+_cqq_device = cuda.jit(device=True)(functions._cqq_scalar.py_func)
+_trivariate_joint_device = cuda.jit(device=True)(functions._trivariate_joint_scalar.py_func)
+
+
+@cuda.jit
+def _bivariate_00_kernel(p1, p2, r, out):
+    i = cuda.grid(1)
+    if i < out.shape[0]:
+        out[i] = _cqq_device(1.0 - p1[i], 1.0 - p2[i], r[i])
+
+
+@cuda.jit
+def _trivariate_joint_kernel(p1, p2, p3, r1, r2, r3, r4, out):
+    i = cuda.grid(1)
+    if i < out.shape[1]:
+        cells = _trivariate_joint_device(p1[i], p2[i], p3[i], r1[i], r2[i], r3[i], r4[i])
+        for k in range(8):
+            out[k, i] = cells[k]
+
+
+def _is_device_array(a):
+    """
+    :return: True if a already lives on the device, the simulator's device arrays only provide __cuda_ndarray__
+    """
+    return hasattr(a, '__cuda_array_interface__') or hasattr(a, '__cuda_ndarray__')
+
+
+def _to_device(a):
+    """
+    :param a: host or device array
+    :return: a as a device array, copying host arrays to the device as contiguous float64
+    """
+    if _is_device_array(a):
+        return a
+    return cuda.to_device(np.ascontiguousarray(a, dtype=np.float64))
+
+
+def _device_args(*args):
+    """
+    Move the arguments to the device and check they are 1d arrays of a common length
+    :return: the device arrays and their common length
+    """
+    args = [_to_device(a) for a in args]
+    n = args[0].shape[0]
+    if any(a.ndim != 1 or a.shape[0] != n for a in args):
+        raise ValueError("inputs must be 1d arrays of equal length, got shapes %s" % [a.shape for a in args])
+    return args, n
+
+
+def _check_out(out, shape):
+    """
+    :return: a new device array of the given shape if out is None, otherwise out after checking its shape
+    :raises TypeError: if out is not a device array, which would be copied to and from the device behind the scenes
+    """
+    if out is None:
+        return cuda.device_array(shape, dtype=np.float64)
+    if not _is_device_array(out):
+        raise TypeError("out must be a device array, got %s" % type(out).__name__)
+    if out.shape != shape:
+        raise ValueError("out must have shape %s, got %s" % (shape, out.shape))
+    return out
+
+
+def _blocks(n):
+    """
+    :return: number of blocks needed to cover n elements with THREADS_PER_BLOCK threads each
+    """
+    return max(1, math.ceil(n / THREADS_PER_BLOCK))
+
+
+def bivariate_00_cuda(p1, p2, r, out=None):
+    """
+    :param p1: Marginal probability of event 1, 1d host or device array
+    :param p2: Marginal probability of event 2, same length as p1
+    :param r: Correlation of event 1 and 2, same length as p1
+    :param out: optional device array of the same length to write the result into
+    :return: device array of the joint probability of neither event occurring
+    :raises ValueError: if the inputs or out do not share a common length
+    :raises TypeError: if out is not a device array
+    """
+    (p1, p2, r), n = _device_args(p1, p2, r)
+    out = _check_out(out, (n,))
+    _bivariate_00_kernel[_blocks(n), THREADS_PER_BLOCK](p1, p2, r, out)
+    return out
+
+
+def trivariate_joint_cuda(p1, p2, p3, r1, r2, r3, r4, out=None):
+    """
+    :param p1: Marginal probability of event 1, 1d host or device array
+    :param p2: Marginal probability of event 2, same length as p1
+    :param p3: Marginal probability of event 3, same length as p1
+    :param r1: Correlation of event 1 and 2, same length as p1
+    :param r2: Correlation of event 2 and 3, same length as p1
+    :param r3: Correlation of event 1 and 3 conditional on event 2 not occurring, same length as p1
+    :param r4: Correlation of event 1 and 3 conditional on event 2 occurring, same length as p1
+    :param out: optional device array of shape (8, len(p1)) to write the result into
+    :return: device array of shape (8, len(p1)) laid out like functions.trivariate_joint
+    :raises ValueError: if the inputs or out do not share a common length
+    :raises TypeError: if out is not a device array
+    """
+    args, n = _device_args(p1, p2, p3, r1, r2, r3, r4)
+    out = _check_out(out, (8, n))
+    _trivariate_joint_kernel[_blocks(n), THREADS_PER_BLOCK](*args, out)
+    return out
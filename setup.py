@@ -0,0 +1,21 @@
+"""
+Builds the optional compiled kernels in _cqq.pyx, used by functions.py when numba is not installed:
+python setup.py build_ext --inplace
+"""
+from Cython.Build import cythonize
+from setuptools import Extension, setup
+
+extensions = [
+    Extension(
+        '_cqq',
+        ['_cqq.pyx'],
+        extra_compile_args=['-O3', '-ffast-math', '-fno-finite-math-only', '-march=native', '-fopenmp'],
+        extra_link_args=['-fopenmp'],
+    )
+]
+
+setup(
+    name='PairProbabilityCopulas',
+    py_modules=['functions'],
+    ext_modules=cythonize(extensions),
+)
@@ -0,0 +1,201 @@
+import importlib.util
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+"""
+Checks that every backend of functions.py (numba, the compiled _cqq extension and plain NumPy) agrees
+"""
+
+FUNCTIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'functions.py')
+
+BIVARIATE = ['bivariate_00', 'bivariate_01', 'bivariate_10', 'bivariate_11', 'bivariate_any', 'bivariate_all']
+TRIVARIATE = ['trivariate000', 'trivariate001', 'trivariate010', 'trivariate011',
+              'trivariate100', 'trivariate101', 'trivariate110', 'trivariate111', 'trivariate_any']
+
+
+def load_functions(blocked):
+    """
+    Import a fresh copy of functions.py with the given optional modules hidden
+    :param blocked: names of modules to make unimportable
+    :return: the loaded module
+    """
+    with pytest.MonkeyPatch.context() as mp:
+        for name in blocked:
+            mp.setitem(sys.modules, name, None)
+        spec = importlib.util.spec_from_file_location('functions_without_' + '_'.join(blocked), FUNCTIONS_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope='module')
+def reference():
+    return load_functions(['numba', '_cqq'])
+
+
+@pytest.fixture(scope='module', params=['default', 'compiled', 'numpy'])
+def backend(request):
+    if request.param == 'default':
+        return load_functions([])
+    if request.param == 'numpy':
+        return load_functions(['numba', '_cqq'])
+    module = load_functions(['numba'])
+    if module._cqq is None:
+        pytest.skip('compiled _cqq extension is not built')
+    return module
+
+
+@pytest.fixture(scope='module')
+def inputs():
+    rng = np.random.default_rng(0)
+    p = rng.uniform(0.01, 0.99, (3, 20000))
+    r = rng.uniform(-1, 1, (4, 20000))
+    return p, r
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_bivariate_matches_numpy(backend, reference, inputs):
+    p, r = inputs
+    for name in BIVARIATE:
+        np.testing.assert_allclose(getattr(backend, name)(p[0], p[1], r[0]),
+                                   getattr(reference, name)(p[0], p[1], r[0]), atol=1e-10, err_msg=name)
+    np.testing.assert_allclose(backend.bivariate_joint(p[0], p[1], r[0]),
+                               reference.bivariate_joint(p[0], p[1], r[0]), atol=1e-10)
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_trivariate_matches_numpy(backend, reference, inputs):
+    p, r = inputs
+    for name in TRIVARIATE:
+        np.testing.assert_allclose(getattr(backend, name)(*p, *r),
+                                   getattr(reference, name)(*p, *r), atol=1e-10, err_msg=name)
+    joint = backend.trivariate_joint(*p, *r)
+    np.testing.assert_allclose(joint, reference.trivariate_joint(*p, *r), atol=1e-10)
+    np.testing.assert_allclose(joint.sum(axis=0), 1.0)
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_scalar_matches_array(backend, inputs):
+    p, r = inputs
+    for name in TRIVARIATE:
+        array = getattr(backend, name)(*p[:, :50], *r[:, :50])
+        scalar = [getattr(backend, name)(*p[:, i].tolist(), *r[:, i].tolist()) for i in range(50)]
+        np.testing.assert_allclose(scalar, array, atol=1e-10, err_msg=name)
+
+
+def _cell_args(name, p, r):
+    return (*p[:2], r[0]) if name.startswith('bivariate') else (*p, *r)
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_out_is_written_in_place(backend, inputs):
+    p, r = inputs[0][:, :100], inputs[1][:, :100]
+    cells = {'copula_clip': (p[0], p[1], r[0] / 2 + 0.5), 'cqq': (p[0], p[1], r[0])}
+    cells.update((name, _cell_args(name, p, r)) for name in BIVARIATE + TRIVARIATE)
+    for name, args in cells.items():
+        expected = getattr(backend, name)(*args)
+        for out in (np.empty(100), np.empty((100, 2))[:, 0]):
+            assert getattr(backend, name)(*args, out=out) is out, name
+            np.testing.assert_allclose(out, expected, atol=1e-10, err_msg=name)
+    for name, n_cells in (('bivariate_joint', 4), ('trivariate_joint', 8)):
+        args = _cell_args(name, p, r)
+        expected = getattr(backend, name)(*args)
+        for out in (np.empty((n_cells, 100)), np.empty((100, n_cells)).T, np.empty((n_cells, 200))[:, ::2]):
+            assert getattr(backend, name)(*args, out=out) is out, name
+            np.testing.assert_allclose(out, expected, atol=1e-10, err_msg=name)
+
+
+def test_joint_rejects_wrongly_shaped_out(backend, inputs):
+    p, r = inputs[0][:, :100], inputs[1][:, :100]
+    for name, n_cells in (('bivariate_joint', 4), ('trivariate_joint', 8)):
+        for shape in ((n_cells + 1, 100), (n_cells - 1, 100), (n_cells, 99), (n_cells * 100,)):
+            with pytest.raises(ValueError):
+                getattr(backend, name)(*_cell_args(name, p, r), out=np.empty(shape))
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_certain_event_2(backend):
+    p1 = np.array([0.3, 0.6])
+    for p2 in (0.0, 1.0):
+        joint = backend.trivariate_joint(0.3, p2, 0.5, 0.2, 0.1, 0.3, 0.4)
+        np.testing.assert_allclose(joint.sum(), 1.0)
+        joint = backend.trivariate_joint(p1, p2, 0.5, 0.2, 0.1, 0.3, 0.4)
+        np.testing.assert_allclose(joint[[0b010, 0b011, 0b110, 0b111] if p2 == 0.0 else [0b000, 0b001, 0b100, 0b101]], 0.0)
+        np.testing.assert_allclose(joint[0b100] + joint[0b101] + joint[0b110] + joint[0b111], p1)
+        for i, name in enumerate(TRIVARIATE[:8]):
+            np.testing.assert_allclose(getattr(backend, name)(p1, p2, 0.5, 0.2, 0.1, 0.3, 0.4), joint[i], err_msg=name)
+        np.testing.assert_allclose(backend.trivariate_any(p1, p2, 0.5, 0.2, 0.1, 0.3, 0.4), 1 - joint[0])
+        assert backend.trivariate_any(0.3, p2, 0.5, 0.2, 0.1, 0.3, 0.4) == pytest.approx(1 - joint[0, 0])
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_nan_correlation_propagates(backend):
+    assert np.isnan(backend.cqq(0.5, 0.5, np.nan))
+    assert np.all(np.isnan(backend.cqq(np.array([0.5, 0.4]), 0.5, np.nan)))
+    assert np.all(np.isnan(backend.bivariate_joint(0.3, 0.4, np.nan)))
+    assert np.isnan(backend.trivariate000(0.3, 0.4, 0.5, 0.1, 0.1, np.nan, 0.1))
+    assert np.isnan(backend.trivariate111(np.array([0.3]), 0.4, 0.5, 0.1, 0.1, 0.1, np.nan)).all()
+
+
+def test_int_arguments_share_the_float_kernel(backend):
+    assert backend.trivariate111(0.3, 1, 0.5, 0, 0, 0, 0) == backend.trivariate111(0.3, 1.0, 0.5, 0.0, 0.0, 0.0, 0.0)
+    assert backend.bivariate_00(1, 0, 0) == backend.bivariate_00(1.0, 0.0, 0.0)
+    if backend.nb is not None:
+        assert [sig for sig in backend._trivariate111_scalar.signatures if sig != (backend.nb.float64,) * 7] == []
+
+
+def test_joint_dtype_matches_cells(backend):
+    p32 = np.array([0.3, 0.6], dtype=np.float32)
+    assert backend.bivariate_joint(0.3, 0.4, 0.5).dtype == np.float64
+    assert backend.trivariate_joint(0.3, 0.4, 0.5, 0.1, 0.2, 0.3, 0.4).dtype == np.float64
+    assert backend.trivariate_joint(np.array([0.3]), 0.4, 0.5, 0, 0, 0, 0).dtype == np.float64
+    if backend._cqq is None:
+        assert backend.bivariate_joint(p32, 0.4, 0.5).dtype == backend.bivariate_00(p32, 0.4, 0.5).dtype == np.float32
+        assert backend.trivariate_joint(p32, 0.4, 0.5, 0.1, 0.2, 0.3, 0.4).dtype == np.float32
+
+
+def test_compiled_kernels_reject_mismatched_lengths():
+    _cqq = pytest.importorskip('_cqq')
+    p = np.full(10, 0.3)
+    with pytest.raises(ValueError):
+        _cqq.cqq(p, p, p[:5], np.empty(10))
+    with pytest.raises(ValueError):
+        _cqq.trivariate_joint(p, p, p, p, p, p, p[:5], np.empty((8, 10)))
+    with pytest.raises(ValueError):
+        _cqq.trivariate_joint(p, p, p, p, p, p, p, np.empty((7, 10)))
+
+
+@pytest.fixture(scope='module')
+def functions_cuda():
+    return pytest.importorskip('functions_cuda', exc_type=ImportError)
+
+
+def test_cuda_rejects_mismatched_lengths(functions_cuda):
+    p = np.full(10, 0.3)
+    with pytest.raises(ValueError):
+        functions_cuda.bivariate_00_cuda(p, p, 0.2)
+    with pytest.raises(ValueError):
+        functions_cuda.trivariate_joint_cuda(p, p, p, p, p, p, p, out=functions_cuda.cuda.device_array((8, 5)))
+    with pytest.raises(TypeError):
+        functions_cuda.trivariate_joint_cuda(p, p, p, p, p, p, p, out=np.empty((8, 10)))
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_cuda_matches_trivariate_joint(functions_cuda, reference, inputs):
+    p, r = inputs[0][:, :300].copy(), inputs[1][:, :300]
+    p[1, :2] = 0.0, 1.0
+    np.testing.assert_allclose(functions_cuda.trivariate_joint_cuda(*p, *r).copy_to_host(),
+                               reference.trivariate_joint(*p, *r), atol=1e-10)
+    np.testing.assert_allclose(functions_cuda.bivariate_00_cuda(p[0], p[1], r[0]).copy_to_host(),
+                               reference.bivariate_00(p[0], p[1], r[0]), atol=1e-10)
+
+
+@pytest.mark.skipif(os.environ.get('NUMBA_ENABLE_CUDASIM') == '1', reason='already running under the CUDA simulator')
+def test_cuda_under_simulator():
+    result = subprocess.run([sys.executable, '-m', 'pytest', '-q', '-p', 'no:cacheprovider', '-k', 'cuda', __file__],
+                            env=dict(os.environ, NUMBA_ENABLE_CUDASIM='1'), capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr